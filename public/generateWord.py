@@ -1,28 +1,106 @@
 # file: tallysheet_docx.py
-from fastapi import FastAPI, Form, BackgroundTasks, File, UploadFile
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, ConfigDict, ValidationError
+from starlette.concurrency import run_in_threadpool
 from docx import Document
-from docx.shared import Pt, Inches
+from docx.shared import Emu, Pt, Inches
 from docx.enum.table import WD_ALIGN_VERTICAL
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
-
+from docx.opc.pkgwriter import PackageWriter
+from docx.oxml.table import CT_Tbl
+from docx.table import Table, _Cell
+from docx.text.run import Run
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from copy import deepcopy
+from functools import lru_cache
+from hashlib import blake2b
 from io import BytesIO
-import tempfile
-import uuid
+import asyncio
+import itertools
+import multiprocessing
+import re
+import time
 import os
-from typing import Optional, Dict, Any, List, Tuple, Union
+import zipfile
+from typing import IO, Optional, Dict, Any, List, NamedTuple, Tuple, Union
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; photos are embedded as uploaded without it
+    Image = None
+
+@asynccontextmanager
+async def _lifespan(app):
+    yield
+    # stop the photo resize workers (see "Photo downscaling")
+    _shutdown_image_pool()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=_lifespan)
 
 # ----------------------- Helpers -----------------------
-def set_cell_shading(cell, hex_color: str) -> None:
-    tc = cell._tc
-    tcPr = tc.get_or_add_tcPr()
+_W_FILL = qn("w:fill")
+
+
+@lru_cache(maxsize=128)
+def _shd_template(hex_color: str):
     shd = OxmlElement("w:shd")
-    shd.set(qn("w:fill"), hex_color)
-    tcPr.append(shd)
+    shd.set(_W_FILL, hex_color)
+    return shd
+
+
+@lru_cache(maxsize=128)
+def _rpr_template(name: str, size_pt: int, bold: bool, italic: bool):
+    # style a detached run once through python-docx, keep its <w:rPr> as the template
+    run = Run(OxmlElement("w:r"), None)
+    run.font.name = name
+    run.font.size = Pt(size_pt)
+    run.bold = bold
+    run.italic = italic
+    return run._r.rPr
+
+
+def set_cell_shading(cell, hex_color: str) -> None:
+    cell._tc.get_or_add_tcPr().append(deepcopy(_shd_template(hex_color)))
+
+
+@lru_cache(maxsize=16)
+def _table_template(rows: int, cols: int, col_width_inches: float, block_width: int) -> CT_Tbl:
+    tbl = CT_Tbl.new_tbl(rows, cols, Emu(block_width))
+    table = Table(tbl, None)
+    table.autofit = False
+    for column in table.columns:
+        column.width = Inches(col_width_inches)
+    return tbl
+
+
+def add_fixed_table(doc: Document, rows: int, cols: int, col_width_inches: float) -> Table:
+    """
+    Same result as doc.add_table() + autofit=False + equal column widths, but cloned from a
+    cached <w:tbl> template for the (rows, cols, width) layout instead of rebuilt each time.
+    """
+    tbl = deepcopy(_table_template(rows, cols, col_width_inches, doc._block_width))
+    doc.element.body._insert_tbl(tbl)
+    return Table(tbl, doc._body)
+
+
+def _row_cells(table: Table, tr) -> List[_Cell]:
+    return [_Cell(tc, table) for tc in tr.tc_lst]
+
+
+def _grid(table: Table) -> List[List[_Cell]]:
+    """
+    Cells of table as [row][col], built once straight from the <w:tr>/<w:tc> elements.
+    table.rows[r].cells[c] recomputes the whole cell grid on every access.
+    """
+    return [_row_cells(table, tr) for tr in table._tbl.tr_lst]
 
 
 def format_input_text(value: Optional[str], placeholder_length: int = 6) -> str:
@@ -38,15 +116,20 @@ def format_checkbox_as_X(value: Optional[str]) -> str:
 
 
 def set_run_style(run, name: str = "Cambria", size_pt: int = 11, bold: bool = False, italic: bool = False) -> None:
+    if run._r.rPr is None:
+        run._r.insert(0, deepcopy(_rpr_template(name, size_pt, bold, italic)))
+        return
+    # run already carries formatting: update it in place so other properties are kept
     run.font.name = name
     run.font.size = Pt(size_pt)
     run.bold = bold
     run.italic = italic
 
 
-def _insert_image_in_cell(cell, image_bytes_or_path: Optional[Union[bytes, str]], max_width_inches: float = 2.8):
+def _insert_image_in_cell(cell, image_bytes_or_path: Optional[Union[bytes, str, IO[bytes]]], max_width_inches: float = 2.8):
     """
-    Insert image centered in a table cell. Accepts bytes (image content) or filesystem path (str).
+    Insert image centered in a table cell. Accepts bytes (image content), a binary file
+    object, or filesystem path (str).
     If no image, insert placeholder text.
     """
     # Clear existing paragraphs (keep first)
@@ -65,6 +148,9 @@ def _insert_image_in_cell(cell, image_bytes_or_path: Optional[Union[bytes, str]]
         if isinstance(image_bytes_or_path, (bytes, bytearray)):
             stream = BytesIO(image_bytes_or_path)
             p.add_run().add_picture(stream, width=Inches(max_width_inches))
+        elif hasattr(image_bytes_or_path, "read"):
+            image_bytes_or_path.seek(0)
+            p.add_run().add_picture(image_bytes_or_path, width=Inches(max_width_inches))
         else:
             p.add_run().add_picture(str(image_bytes_or_path), width=Inches(max_width_inches))
     except Exception:
@@ -72,31 +158,153 @@ def _insert_image_in_cell(cell, image_bytes_or_path: Optional[Union[bytes, str]]
         set_run_style(run, size_pt=9, italic=True)
 
 
+# ----------------------- Photo downscaling -----------------------
+PHOTO_DPI = 150
+PHOTO_MAX_WIDTH_INCHES = 2.8
+_PHOTO_MAX_PX = int(PHOTO_MAX_WIDTH_INCHES * PHOTO_DPI)  # ~420 px
+_RESIZED_CACHE: Dict[bytes, bytes] = {}
+_RESIZED_CACHE_MAX = 256
+
+
+# resize processes per server worker; kept small since every server worker gets its own pool
+IMAGE_POOL_WORKERS = max(1, int(os.environ.get("IMAGE_POOL_WORKERS", "2")))
+_IMAGE_POOL: Optional[ProcessPoolExecutor] = None
+
+
+def _image_pool() -> ProcessPoolExecutor:
+    global _IMAGE_POOL
+    if _IMAGE_POOL is None:
+        # spawn, not fork: forking the running (multi-threaded) server process is unsafe
+        _IMAGE_POOL = ProcessPoolExecutor(
+            max_workers=IMAGE_POOL_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _IMAGE_POOL
+
+
+def _drop_image_pool(pool: ProcessPoolExecutor) -> None:
+    """Forget a broken pool (a worker died) so the next photo request starts a fresh one."""
+    global _IMAGE_POOL
+    if _IMAGE_POOL is pool:
+        _IMAGE_POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _shutdown_image_pool() -> None:
+    if _IMAGE_POOL is not None:
+        _IMAGE_POOL.shutdown(cancel_futures=True)
+
+
+def _resize_image(data: bytes, max_px: int = _PHOTO_MAX_PX) -> Optional[bytes]:
+    """
+    Shrink a photo to the pixel width it is printed at and re-encode it, so the docx does
+    not embed multi-MB originals: JPEG normally, PNG for images with transparency (JPEG has
+    no alpha; transparent areas would come out black). Runs in a worker process.
+    Returns None if the image is already small enough or cannot be decoded.
+    """
+    try:
+        with Image.open(BytesIO(data)) as im:
+            if im.width <= max_px:
+                return None
+            im = ImageOps.exif_transpose(im)
+            has_alpha = "A" in im.getbands() or "transparency" in im.info
+            if has_alpha:
+                im = im.convert("RGBA")
+            elif im.mode not in ("RGB", "L"):
+                im = im.convert("RGB")
+            im.thumbnail((max_px, max_px * 4))
+            buf = BytesIO()
+            if has_alpha:
+                im.save(buf, "PNG", optimize=True)
+            else:
+                im.save(buf, "JPEG", quality=82, optimize=True)
+            return buf.getvalue()
+    except Exception:
+        return None
+
+
+def _read_whole(f: IO[bytes]) -> bytes:
+    f.seek(0)
+    return f.read()
+
+
+async def _downscale_photos(images: Dict[str, Any], digests: Dict[str, bytes]) -> None:
+    """
+    Replace the uploaded photos in `images` (in place) by downscaled JPEG (or PNG) bytes.
+    Results are cached by content digest (identical uploads are resized once); cache misses
+    are resized in parallel in worker processes. Photos that need no resizing, or everything
+    when Pillow is missing, are left as uploaded.
+    """
+    if Image is None:
+        return
+    loop = asyncio.get_running_loop()
+    misses = []
+    for name in PHOTO_FIELDS:
+        upload = images.get(name)
+        if upload is None:
+            continue
+        cached = _RESIZED_CACHE.get(digests.get(name))
+        if cached is not None:
+            images[name] = cached
+            continue
+        misses.append(name)
+    # spools over 1 MiB live on disk: read them in worker threads, not on the event loop
+    blobs = await asyncio.gather(*(run_in_threadpool(_read_whole, images[name]) for name in misses))
+    pending = []
+    for name, blob in zip(misses, blobs):
+        pool = _image_pool()
+        try:
+            pending.append((name, loop.run_in_executor(pool, _resize_image, blob)))
+        except BrokenProcessPool:
+            _drop_image_pool(pool)  # this photo stays as uploaded
+    resized = await asyncio.gather(*(fut for _, fut in pending), return_exceptions=True)
+    for (name, _), data in zip(pending, resized):
+        if isinstance(data, BrokenProcessPool) and _IMAGE_POOL is not None:
+            _drop_image_pool(_IMAGE_POOL)
+        if data is None or isinstance(data, BaseException):
+            continue
+        if len(_RESIZED_CACHE) >= _RESIZED_CACHE_MAX:
+            _RESIZED_CACHE.clear()
+        _RESIZED_CACHE[digests[name]] = data
+        images[name] = data
+
+
 # ----------------------- Validation helper -----------------------
-def validate_numeric_fields(form: Dict[str, Any], rules: List[Tuple[str, bool]]) -> List[Dict[str, str]]:
+_INT = re.compile(r"^[+-]?\d+$")
+_FLOAT = re.compile(r"^[+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?$")
+
+
+class NumericRules(NamedTuple):
+    """Validation rules flattened for the hot loop: field names + bit i set if fields[i] is integer."""
+    fields: Tuple[str, ...]
+    int_mask: int
+
+
+def compile_numeric_rules(rules: List[Tuple[str, bool]]) -> NumericRules:
+    return NumericRules(
+        fields=tuple(name for name, _ in rules),
+        int_mask=sum(1 << i for i, (_, is_int) in enumerate(rules) if is_int),
+    )
+
+
+def validate_numeric_fields(form: Dict[str, Any], rules: Union[NumericRules, List[Tuple[str, bool]]]) -> List[Dict[str, str]]:
     """
-    rules: list of tuples (field_name, is_integer)
-      - is_integer True -> try int()
-      - else -> try float()
+    rules: list of tuples (field_name, is_integer), or the same precompiled with compile_numeric_rules
+      - is_integer True -> must match an integer literal
+      - else -> must match a decimal number (optionally with exponent)
     Returns list of error dicts: [{"field": name, "msg": "..."}]
+    Empty values are allowed (we use placeholder).
     """
+    if not isinstance(rules, NumericRules):
+        rules = compile_numeric_rules(rules)
+    fields, int_mask = rules
     errors = []
-    for field, is_int in rules:
-        val = form.get(field)
-        if val is None or str(val).strip() == "":
-            # empty allowed (we use placeholder)
+    for i, field in enumerate(fields):
+        s = str(form.get(field) or "").strip()
+        if not s:
             continue
-        s = str(val).strip()
-        try:
-            if is_int:
-                int(s)
-            else:
-                float(s)
-        except Exception:
-            errors.append({
-                "field": field,
-                "msg": f"Expected {'integer' if is_int else 'number'} but got '{s}'"
-            })
+        is_int = int_mask >> i & 1
+        if not (_INT if is_int else _FLOAT).match(s):
+            errors.append({"field": field, "msg": f"Expected {'integer' if is_int else 'number'} but got '{s}'"})
     return errors
 
 
@@ -145,13 +353,11 @@ def add_foto_lapangan_section(
     if images is None:
         images = {}
 
-    table = doc.add_table(rows=1, cols=2)
-    table.autofit = False
-    table.columns[0].width = Inches(4.5)
-    table.columns[1].width = Inches(4.5)
+    table = add_fixed_table(doc, rows=1, cols=2, col_width_inches=4.5)
 
     # Header merged
-    hdr = table.rows[0].cells[0].merge(table.rows[0].cells[1])
+    hdr_cells = _grid(table)[0]
+    hdr = hdr_cells[0].merge(hdr_cells[1])
     p = hdr.paragraphs[0]
     p.alignment = WD_ALIGN_PARAGRAPH.CENTER
     run = p.add_run("B.\tFOTO  LAPANGAN")
@@ -163,14 +369,15 @@ def add_foto_lapangan_section(
 
     # Item 1
     row = table.add_row()
-    cell = row.cells[0].merge(row.cells[1])
+    row_cells = _row_cells(table, row._tr)
+    cell = row_cells[0].merge(row_cells[1])
     p = cell.paragraphs[0]
     p.alignment = WD_ALIGN_PARAGRAPH.LEFT
     run = p.add_run("1.  Air tanah, genangan atau banjir")
     set_run_style(run, size_pt=11, bold=True)
 
     img_row = table.add_row()
-    left, right = img_row.cells[0], img_row.cells[1]
+    left, right = _row_cells(table, img_row._tr)
     left.vertical_alignment = WD_ALIGN_VERTICAL.TOP
     right.vertical_alignment = WD_ALIGN_VERTICAL.TOP
     _insert_image_in_cell(left, images.get("foto_air_tanah_genangan_1"), max_image_width_inches)
@@ -178,14 +385,15 @@ def add_foto_lapangan_section(
 
     # Item 2
     row = table.add_row()
-    cell = row.cells[0].merge(row.cells[1])
+    row_cells = _row_cells(table, row._tr)
+    cell = row_cells[0].merge(row_cells[1])
     p = cell.paragraphs[0]
     p.alignment = WD_ALIGN_PARAGRAPH.LEFT
     run = p.add_run("2.  Tutupan lahan, penggunaan lahan dan kondisinya")
     set_run_style(run, size_pt=11, bold=True)
 
     img_row = table.add_row()
-    left, right = img_row.cells[0], img_row.cells[1]
+    left, right = _row_cells(table, img_row._tr)
     left.vertical_alignment = WD_ALIGN_VERTICAL.TOP
     right.vertical_alignment = WD_ALIGN_VERTICAL.TOP
     _insert_image_in_cell(left, images.get("foto_tutupan_lahan_1"), max_image_width_inches)
@@ -193,14 +401,15 @@ def add_foto_lapangan_section(
 
     # Item 3
     row = table.add_row()
-    cell = row.cells[0].merge(row.cells[1])
+    row_cells = _row_cells(table, row._tr)
+    cell = row_cells[0].merge(row_cells[1])
     p = cell.paragraphs[0]
     p.alignment = WD_ALIGN_PARAGRAPH.LEFT
     run = p.add_run("3.  Keberadaan flora dan fauna yang dilindungi")
     set_run_style(run, size_pt=11, bold=True)
 
     img_row = table.add_row()
-    left, right = img_row.cells[0], img_row.cells[1]
+    left, right = _row_cells(table, img_row._tr)
     left.vertical_alignment = WD_ALIGN_VERTICAL.TOP
     right.vertical_alignment = WD_ALIGN_VERTICAL.TOP
     _insert_image_in_cell(left, images.get("foto_flora_fauna_1"), max_image_width_inches)
@@ -208,7 +417,8 @@ def add_foto_lapangan_section(
 
     # Item 4 (drainase)
     row = table.add_row()
-    cell = row.cells[0].merge(row.cells[1])
+    row_cells = _row_cells(table, row._tr)
+    cell = row_cells[0].merge(row_cells[1])
     p = cell.paragraphs[0]
     p.alignment = WD_ALIGN_PARAGRAPH.LEFT
     run = p.add_run("4.  Kondisi drainase alami dan drainase buatan")
@@ -216,14 +426,14 @@ def add_foto_lapangan_section(
 
     # subheader row
     sub_row = table.add_row()
-    left, right = sub_row.cells[0], sub_row.cells[1]
+    left, right = _row_cells(table, sub_row._tr)
     pleft = left.paragraphs[0]; pleft.alignment = WD_ALIGN_PARAGRAPH.CENTER
     pright = right.paragraphs[0]; pright.alignment = WD_ALIGN_PARAGRAPH.CENTER
     rleft = pleft.add_run("Drainase alami"); set_run_style(rleft, size_pt=11, bold=True)
     rright = pright.add_run("Drainase buatan"); set_run_style(rright, size_pt=11, bold=True)
 
     img_row = table.add_row()
-    left, right = img_row.cells[0], img_row.cells[1]
+    left, right = _row_cells(table, img_row._tr)
     left.vertical_alignment = WD_ALIGN_VERTICAL.TOP
     right.vertical_alignment = WD_ALIGN_VERTICAL.TOP
     _insert_image_in_cell(left, images.get("foto_drainase_alami"), max_image_width_inches)
@@ -254,21 +464,18 @@ def add_additional_photo_sections(
     p5 = doc.add_paragraph(); p5.alignment = WD_ALIGN_PARAGRAPH.LEFT
     r5 = p5.add_run("5.  Kualitas Air/Kondisi Air Kanal"); set_run_style(r5, size_pt=11, bold=True)
 
-    tbl5 = doc.add_table(rows=2, cols=3)
-    tbl5.autofit = False
-    tbl5.columns[0].width = Inches(3.0)
-    tbl5.columns[1].width = Inches(3.0)
-    tbl5.columns[2].width = Inches(3.0)
+    tbl5 = add_fixed_table(doc, rows=2, cols=3, col_width_inches=3.0)
+    tbl5_cells = _grid(tbl5)
     for i, lbl in enumerate(["EC", "TDS", "pH"]):
-        c = tbl5.rows[0].cells[i]
+        c = tbl5_cells[0][i]
         p = c.paragraphs[0]; p.alignment = WD_ALIGN_PARAGRAPH.CENTER
         run = p.add_run(lbl); set_run_style(run, size_pt=11, bold=True)
         c.vertical_alignment = WD_ALIGN_VERTICAL.TOP
 
     # image row
-    _insert_image_in_cell(tbl5.rows[1].cells[0], images.get("foto_kualitas_air_ec"), max_image_width_inches)
-    _insert_image_in_cell(tbl5.rows[1].cells[1], images.get("foto_kualitas_air_tds"), max_image_width_inches)
-    _insert_image_in_cell(tbl5.rows[1].cells[2], images.get("foto_kualitas_air_ph"), max_image_width_inches)
+    _insert_image_in_cell(tbl5_cells[1][0], images.get("foto_kualitas_air_ec"), max_image_width_inches)
+    _insert_image_in_cell(tbl5_cells[1][1], images.get("foto_kualitas_air_tds"), max_image_width_inches)
+    _insert_image_in_cell(tbl5_cells[1][2], images.get("foto_kualitas_air_ph"), max_image_width_inches)
 
     doc.add_paragraph()
 
@@ -276,64 +483,64 @@ def add_additional_photo_sections(
     p6 = doc.add_paragraph(); p6.alignment = WD_ALIGN_PARAGRAPH.LEFT
     r6 = p6.add_run("6.  Pengukuran Tinggi Muka Air Tanah (TMAT) pada lubang bor titik pengamatan"); set_run_style(r6, size_pt=11, bold=True)
 
-    tbl6 = doc.add_table(rows=1, cols=2); tbl6.autofit = False
-    tbl6.columns[0].width = Inches(4.5); tbl6.columns[1].width = Inches(4.5)
-    _insert_image_in_cell(tbl6.rows[0].cells[0], images.get("foto_tmat_1"), max_image_width_inches)
-    _insert_image_in_cell(tbl6.rows[0].cells[1], images.get("foto_tmat_2"), max_image_width_inches)
+    tbl6 = add_fixed_table(doc, rows=1, cols=2, col_width_inches=4.5)
+    tbl6_cells = _grid(tbl6)
+    _insert_image_in_cell(tbl6_cells[0][0], images.get("foto_tmat_1"), max_image_width_inches)
+    _insert_image_in_cell(tbl6_cells[0][1], images.get("foto_tmat_2"), max_image_width_inches)
 
     doc.add_paragraph()
 
     # Section 7: Ketebalan gambut (two images)
     p7 = doc.add_paragraph(); p7.alignment = WD_ALIGN_PARAGRAPH.LEFT
     r7 = p7.add_run("7.  Ketebalan gambut"); set_run_style(r7, size_pt=11, bold=True)
-    tbl7 = doc.add_table(rows=1, cols=2); tbl7.autofit = False
-    tbl7.columns[0].width = Inches(4.5); tbl7.columns[1].width = Inches(4.5)
-    _insert_image_in_cell(tbl7.rows[0].cells[0], images.get("foto_ketebalan_gambut_1"), max_image_width_inches)
-    _insert_image_in_cell(tbl7.rows[0].cells[1], images.get("foto_ketebalan_gambut_2"), max_image_width_inches)
+    tbl7 = add_fixed_table(doc, rows=1, cols=2, col_width_inches=4.5)
+    tbl7_cells = _grid(tbl7)
+    _insert_image_in_cell(tbl7_cells[0][0], images.get("foto_ketebalan_gambut_1"), max_image_width_inches)
+    _insert_image_in_cell(tbl7_cells[0][1], images.get("foto_ketebalan_gambut_2"), max_image_width_inches)
 
     doc.add_paragraph()
 
     # Section 8: Karakteristik substratum (EC / pH)
     p8 = doc.add_paragraph(); p8.alignment = WD_ALIGN_PARAGRAPH.LEFT
     r8 = p8.add_run("8.  Karakteristik substratum dibawah lapisan gambut"); set_run_style(r8, size_pt=11, bold=True)
-    tbl8 = doc.add_table(rows=2, cols=2); tbl8.autofit = False
-    tbl8.columns[0].width = Inches(4.5); tbl8.columns[1].width = Inches(4.5)
-    c_ec = tbl8.rows[0].cells[0].paragraphs[0]; c_ec.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    c_ph = tbl8.rows[0].cells[1].paragraphs[0]; c_ph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    tbl8 = add_fixed_table(doc, rows=2, cols=2, col_width_inches=4.5)
+    tbl8_cells = _grid(tbl8)
+    c_ec = tbl8_cells[0][0].paragraphs[0]; c_ec.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    c_ph = tbl8_cells[0][1].paragraphs[0]; c_ph.alignment = WD_ALIGN_PARAGRAPH.CENTER
     c_ec.add_run("EC"); set_run_style(c_ec.runs[0], size_pt=11, bold=True)
     c_ph.add_run("pH"); set_run_style(c_ph.runs[0], size_pt=11, bold=True)
-    _insert_image_in_cell(tbl8.rows[1].cells[0], images.get("foto_substratum_ec"), max_image_width_inches)
-    _insert_image_in_cell(tbl8.rows[1].cells[1], images.get("foto_substratum_ph"), max_image_width_inches)
+    _insert_image_in_cell(tbl8_cells[1][0], images.get("foto_substratum_ec"), max_image_width_inches)
+    _insert_image_in_cell(tbl8_cells[1][1], images.get("foto_substratum_ph"), max_image_width_inches)
 
     doc.add_paragraph()
 
     # Section 9: Perkembangan kerusakan (two images)
     p9 = doc.add_paragraph(); p9.alignment = WD_ALIGN_PARAGRAPH.LEFT
     r9 = p9.add_run("9.  Perkembangan kondisi atau tingkat kerusakan lahan gambut (fungsi lindung/fungsi budidaya)"); set_run_style(r9, size_pt=11, bold=True)
-    tbl9 = doc.add_table(rows=1, cols=2); tbl9.autofit = False
-    tbl9.columns[0].width = Inches(4.5); tbl9.columns[1].width = Inches(4.5)
-    _insert_image_in_cell(tbl9.rows[0].cells[0], images.get("foto_kerusakan_lahan_gambut_1"), max_image_width_inches)
-    _insert_image_in_cell(tbl9.rows[0].cells[1], images.get("foto_kerusakan_lahan_gambut_2"), max_image_width_inches)
+    tbl9 = add_fixed_table(doc, rows=1, cols=2, col_width_inches=4.5)
+    tbl9_cells = _grid(tbl9)
+    _insert_image_in_cell(tbl9_cells[0][0], images.get("foto_kerusakan_lahan_gambut_1"), max_image_width_inches)
+    _insert_image_in_cell(tbl9_cells[0][1], images.get("foto_kerusakan_lahan_gambut_2"), max_image_width_inches)
 
     doc.add_paragraph()
 
     # Section 10: Karakteristik tanah pirit (two images)
     p10 = doc.add_paragraph(); p10.alignment = WD_ALIGN_PARAGRAPH.LEFT
     r10 = p10.add_run("10.  Karakteristik tanah dan kedalaman lapisan pirit"); set_run_style(r10, size_pt=11, bold=True)
-    tbl10 = doc.add_table(rows=1, cols=2); tbl10.autofit = False
-    tbl10.columns[0].width = Inches(4.5); tbl10.columns[1].width = Inches(4.5)
-    _insert_image_in_cell(tbl10.rows[0].cells[0], images.get("foto_karakteristik_tanah_pirit_1"), max_image_width_inches)
-    _insert_image_in_cell(tbl10.rows[0].cells[1], images.get("foto_karakteristik_tanah_pirit_2"), max_image_width_inches)
+    tbl10 = add_fixed_table(doc, rows=1, cols=2, col_width_inches=4.5)
+    tbl10_cells = _grid(tbl10)
+    _insert_image_in_cell(tbl10_cells[0][0], images.get("foto_karakteristik_tanah_pirit_1"), max_image_width_inches)
+    _insert_image_in_cell(tbl10_cells[0][1], images.get("foto_karakteristik_tanah_pirit_2"), max_image_width_inches)
 
     doc.add_paragraph()
 
     # Section 11: Porositas & Kelengasan (two images)
     p11 = doc.add_paragraph(); p11.alignment = WD_ALIGN_PARAGRAPH.LEFT
     r11 = p11.add_run("11.  Porositas dan Kelengasan"); set_run_style(r11, size_pt=11, bold=True)
-    tbl11 = doc.add_table(rows=1, cols=2); tbl11.autofit = False
-    tbl11.columns[0].width = Inches(4.5); tbl11.columns[1].width = Inches(4.5)
-    _insert_image_in_cell(tbl11.rows[0].cells[0], images.get("foto_porositas_kelengasan_1"), max_image_width_inches)
-    _insert_image_in_cell(tbl11.rows[0].cells[1], images.get("foto_porositas_kelengasan_2"), max_image_width_inches)
+    tbl11 = add_fixed_table(doc, rows=1, cols=2, col_width_inches=4.5)
+    tbl11_cells = _grid(tbl11)
+    _insert_image_in_cell(tbl11_cells[0][0], images.get("foto_porositas_kelengasan_1"), max_image_width_inches)
+    _insert_image_in_cell(tbl11_cells[0][1], images.get("foto_porositas_kelengasan_2"), max_image_width_inches)
 
     doc.add_paragraph()
 
@@ -341,432 +548,656 @@ def add_additional_photo_sections(
     p12 = doc.add_paragraph(); p12.alignment = WD_ALIGN_PARAGRAPH.LEFT
     r12 = p12.add_run("12.  Foto Tambahan"); set_run_style(r12, size_pt=11, bold=True)
 
+    # one table, one row per pair of images
     tambahan_keys = [f"foto_tambahan_{i}" for i in range(1, 9)]
     pair_iter = [tambahan_keys[i:i+2] for i in range(0, len(tambahan_keys), 2)]
-    for pair in pair_iter:
-        tbl = doc.add_table(rows=1, cols=2); tbl.autofit = False
-        tbl.columns[0].width = Inches(4.5); tbl.columns[1].width = Inches(4.5)
+    tbl12 = add_fixed_table(doc, rows=len(pair_iter), cols=2, col_width_inches=4.5)
+    tbl12_cells = _grid(tbl12)
+    for row_cells, pair in zip(tbl12_cells, pair_iter):
         left_key = pair[0]
         right_key = pair[1] if len(pair) > 1 else None
-        _insert_image_in_cell(tbl.rows[0].cells[0], images.get(left_key), max_image_width_inches)
-        if right_key:
-            _insert_image_in_cell(tbl.rows[0].cells[1], images.get(right_key), max_image_width_inches)
-        else:
-            _insert_image_in_cell(tbl.rows[0].cells[1], None, max_image_width_inches)
-        doc.add_paragraph()
+        _insert_image_in_cell(row_cells[0], images.get(left_key), max_image_width_inches)
+        _insert_image_in_cell(row_cells[1], images.get(right_key) if right_key else None, max_image_width_inches)
+    doc.add_paragraph()
 
 
-# ----------------------- Endpoint: generate-full-section -----------------------
-@app.post("/generate-full-section")
-async def generate_full_section(
-    background_tasks: BackgroundTasks,
-    # koordinat (1)
-    latitude_derajat: str = Form(None),
-    latitude_menit: str = Form(None),
-    latitude_detik: str = Form(None),
-    latitude_arah: str = Form(None),
-    longitude_derajat: str = Form(None),
-    longitude_menit: str = Form(None),
-    longitude_detik: str = Form(None),
-    longitude_arah: str = Form(None),
-    # elevasi (2)
-    elevasi_lahan: str = Form(None),
-    # kondisi air tanah (3)
-    kedalaman_air_tanah: str = Form(None),
-    genangan: str = Form(None),
-    banjir_bulan: str = Form(None),
-    banjir_lama_hari: str = Form(None),
-    banjir_ketinggian_air: str = Form(None),
-    sumber_air_hujan: str = Form(None),
-    sumber_air_limpasan_sungai: str = Form(None),
-    sumber_air_kiriman_hulu: str = Form(None),
-    sumber_air_lainnya_checkbox: str = Form(None),
-    sumber_air_lainnya_text: str = Form(None),
-    # tutupan lahan (4)
-    jenis_tanaman: str = Form(None),
-    status_masyarakat: str = Form(None),
-    status_perusahaan: str = Form(None),
-    nama_perusahaan: str = Form(None),
-    luas_konsesi: str = Form(None),
-    # flora/fauna (5)
-    flora_tidak_ada: str = Form(None),
-    flora_ada: str = Form(None),
-    flora_jenis: str = Form(None),
-    fauna_tidak_ada: str = Form(None),
-    fauna_ada: str = Form(None),
-    fauna_jenis: str = Form(None),
-    # drainase (6)
-    drainase_alami_tidak_ada: str = Form(None),
-    drainase_alami_ada: str = Form(None),
-    drainase_buatan_tidak_ada: str = Form(None),
-    drainase_buatan_ada: str = Form(None),
-    drainase_buatan_saluran_terbuka: str = Form(None),
-    drainase_buatan_saluran_terkontrol: str = Form(None),
-    tinggi_muka_air_saluran: str = Form(None),
-    # kualitas air (7)
-    kualitas_air_tanah_ph: str = Form(None),
-    kualitas_air_saluran_ph: str = Form(None),
-    kualitas_air_tanah_ec: str = Form(None),
-    kualitas_air_saluran_ec: str = Form(None),
-    kualitas_air_tanah_tds: str = Form(None),
-    kualitas_air_saluran_tds: str = Form(None),
-    # substratum tanah liat (8)
-    substratum_tanah_liat_ph: str = Form(None),
-    substratum_tanah_liat_ec: str = Form(None),
-    # tipe luapan (9)
-    tipe_luapan_kemarau_a: str = Form(None),
-    tipe_luapan_kemarau_b: str = Form(None),
-    tipe_luapan_kemarau_c: str = Form(None),
-    tipe_luapan_kemarau_d: str = Form(None),
-    tipe_luapan_hujan_a: str = Form(None),
-    tipe_luapan_hujan_b: str = Form(None),
-    tipe_luapan_hujan_c: str = Form(None),
-    tipe_luapan_hujan_d: str = Form(None),
-    # ketebalan gambut (10)
-    ketebalan_gambut_cm: str = Form(None),
-    tingkat_perombakan_saprik: str = Form(None),
-    tingkat_perombakan_hemik: str = Form(None),
-    tingkat_perombakan_fibrik: str = Form(None),
-    # substratum bawah (11)
-    substratum_pasir_kwarsa: str = Form(None),
-    substratum_clay_sedimen_sungai: str = Form(None),
-    substratum_sedimen_berpirit: str = Form(None),
-    substratum_granit: str = Form(None),
-    substratum_lainnya_checkbox: str = Form(None),
-    substratum_lainnya_text: str = Form(None),
-    # perkembangan kerusakan (12)
-    kerusakan_drainase_buatan: str = Form(None),
-    kerusakan_terekspos_sedimen: str = Form(None),
-    kondisi_tanaman_tidak_normal: str = Form(None),
-    kondisi_tanaman_tidak_produktif: str = Form(None),
-    kondisi_tanaman_miring_tumbang: str = Form(None),
-    kondisi_tanaman_terjadi_subsiden_checkbox: str = Form(None),
-    kondisi_tanaman_subsiden_cm: str = Form(None),
-    kerapatan_tajuk: str = Form(None),
-    # informasi kebakaran & hujan (13)
-    kebakaran_tahun: str = Form(None),
-    kebakaran_bulan: str = Form(None),
-    kebakaran_tanggal: str = Form(None),
-    kebakaran_lama_kejadian_bulan: str = Form(None),
-    pemadaman_swadaya_masyarakat: str = Form(None),
-    pemadaman_bantuan_pemerintah: str = Form(None),
-    hujan_tanggal: str = Form(None),
-    hujan_bulan: str = Form(None),
-    hujan_tahun: str = Form(None),
-    hujan_lama_kejadian_jam: str = Form(None),
-    intensitas_hujan_tinggi: str = Form(None),
-    intensitas_hujan_sedang: str = Form(None),
-    intensitas_hujan_rendah: str = Form(None),
-    # porositas / kelengasan / c-organik (14..16)
-    porositas_bobot_isi: str = Form(None),
-    kelengasan_kadar_air: str = Form(None),
-    c_organik: str = Form(None),
-    # sketsa lokasi (file)
-    sketsa_lokasi_image: UploadFile = File(None),
-    # photos: multiple optional UploadFile fields (example names)
-    foto_air_tanah_genangan_1: UploadFile = File(None),
-    foto_air_tanah_genangan_2: UploadFile = File(None),
-    foto_tutupan_lahan_1: UploadFile = File(None),
-    foto_tutupan_lahan_2: UploadFile = File(None),
-    foto_flora_fauna_1: UploadFile = File(None),
-    foto_flora_fauna_2: UploadFile = File(None),
-    foto_drainase_alami: UploadFile = File(None),
-    foto_drainase_buatan: UploadFile = File(None),
-    foto_kualitas_air_ec: UploadFile = File(None),
-    foto_kualitas_air_tds: UploadFile = File(None),
-    foto_kualitas_air_ph: UploadFile = File(None),
-    foto_tmat_1: UploadFile = File(None),
-    foto_tmat_2: UploadFile = File(None),
-    foto_ketebalan_gambut_1: UploadFile = File(None),
-    foto_ketebalan_gambut_2: UploadFile = File(None),
-    foto_substratum_ec: UploadFile = File(None),
-    foto_substratum_ph: UploadFile = File(None),
-    foto_kerusakan_lahan_gambut_1: UploadFile = File(None),
-    foto_kerusakan_lahan_gambut_2: UploadFile = File(None),
-    foto_karakteristik_tanah_pirit_1: UploadFile = File(None),
-    foto_karakteristik_tanah_pirit_2: UploadFile = File(None),
-    foto_porositas_kelengasan_1: UploadFile = File(None),
-    foto_porositas_kelengasan_2: UploadFile = File(None),
-    # foto tambahan 1..8
-    foto_tambahan_1: UploadFile = File(None),
-    foto_tambahan_2: UploadFile = File(None),
-    foto_tambahan_3: UploadFile = File(None),
-    foto_tambahan_4: UploadFile = File(None),
-    foto_tambahan_5: UploadFile = File(None),
-    foto_tambahan_6: UploadFile = File(None),
-    foto_tambahan_7: UploadFile = File(None),
-    foto_tambahan_8: UploadFile = File(None),
-):
-    # Collect form into dict for validation convenience
-    form = dict(locals())
-
-    # Build numeric validation rules (field_name, is_integer)
-    numeric_rules = [
-        ("latitude_derajat", False),
-        ("latitude_menit", False),
-        ("latitude_detik", False),
-        ("longitude_derajat", False),
-        ("longitude_menit", False),
-        ("longitude_detik", False),
-        ("elevasi_lahan", False),
-        ("kedalaman_air_tanah", False),
-        ("genangan", False),
-        ("banjir_lama_hari", True),
-        ("banjir_ketinggian_air", False),
-        ("tinggi_muka_air_saluran", False),
-        ("kualitas_air_tanah_ph", False),
-        ("kualitas_air_saluran_ph", False),
-        ("kualitas_air_tanah_ec", False),
-        ("kualitas_air_saluran_ec", False),
-        ("kualitas_air_tanah_tds", False),
-        ("kualitas_air_saluran_tds", False),
-        ("substratum_tanah_liat_ph", False),
-        ("substratum_tanah_liat_ec", False),
-        ("ketebalan_gambut_cm", False),
-        ("kondisi_tanaman_subsiden_cm", False),
-        ("hujan_lama_kejadian_jam", False),
-        ("porositas_bobot_isi", False),
-        ("kelengasan_kadar_air", False),
-        ("c_organik", False),
-    ]
-    errors = validate_numeric_fields(form, numeric_rules)
-    if errors:
-        return JSONResponse(status_code=422, content={"detail": errors})
+@lru_cache(maxsize=1)
+def _placeholder_photo_xml() -> Tuple[Any, ...]:
+    """Body elements of both photo sections rendered on new_document() with no images."""
+    scratch = new_document()
+    body = scratch.element.body
+    start = len(body) - 1  # everything before the trailing <w:sectPr>
+    add_foto_lapangan_section(scratch, images={})
+    add_additional_photo_sections(scratch, images={})
+    return tuple(body[start:-1])
+
 
-    # Build document
-    doc = Document()
-    sec = doc.sections[0]
-    sec.top_margin = Inches(1)
-    sec.bottom_margin = Inches(1)
-    sec.left_margin = Inches(1.25)
-    sec.right_margin = Inches(1.25)
+def add_photo_sections(doc: Document, images: Dict[str, Optional[Union[bytes, str, IO[bytes]]]]) -> None:
+    """
+    add_foto_lapangan_section + add_additional_photo_sections. With no photos at all the
+    output is always the same "(no image)" layout, so for documents with the new_document()
+    page layout it is cloned from a cached copy.
+    """
+    if any(images.get(name) for name in PHOTO_FIELDS) or doc._block_width != _BLANK._block_width:
+        add_foto_lapangan_section(doc, images=images)
+        add_additional_photo_sections(doc, images=images)
+        return
+    sect_pr = doc.element.body.sectPr
+    for el in _placeholder_photo_xml():
+        sect_pr.addprevious(deepcopy(el))
+
+
+# ----------------------- Full document build -----------------------
+# blank document with the tallysheet margins, parsed once; every build works on a deepcopy
+_BLANK = Document()
+_sec = _BLANK.sections[0]
+_sec.top_margin = Inches(1)
+_sec.bottom_margin = Inches(1)
+_sec.left_margin = Inches(1.25)
+_sec.right_margin = Inches(1.25)
+del _sec
+
+
+def new_document() -> Document:
+    return deepcopy(_BLANK)
+
+
+_STORED_EXTS = {"jpg", "jpeg", "png", "gif"}
+
+
+# fixed entry timestamp: the same parts always give byte-identical output (stable ETags)
+_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+class _DocxZipWriter:
+    """
+    Physical writer for python-docx's PackageWriter: XML parts are deflated as usual,
+    already-compressed images are stored as-is (deflate gains <1% on them).
+    """
+
+    def __init__(self, fileobj):
+        self._zipf = zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED)
+
+    def write(self, pack_uri, blob):
+        info = zipfile.ZipInfo(pack_uri.membername, date_time=_ZIP_DATE_TIME)
+        info.compress_type = zipfile.ZIP_STORED if pack_uri.ext.lower() in _STORED_EXTS else zipfile.ZIP_DEFLATED
+        self._zipf.writestr(info, blob)
+
+    def close(self):
+        self._zipf.close()
+
+
+# _save_docx drives PackageWriter's private static helpers (written against python-docx 1.2).
+# If a python-docx release renames them, fall back to the public doc.save(): same document,
+# only without ZIP_STORED media and fixed entry timestamps.
+_FAST_SAVE = all(
+    callable(getattr(PackageWriter, name, None))
+    for name in ("_write_content_types_stream", "_write_pkg_rels", "_write_parts")
+)
+
+
+def _save_docx(doc: Document, fileobj) -> None:
+    """Same as doc.save(fileobj), but media parts are written with ZIP_STORED."""
+    if not _FAST_SAVE:
+        doc.save(fileobj)
+        return
+    package = doc.part.package
+    parts = list(package.iter_parts())
+    for part in parts:
+        part.before_marshal()
+    writer = _DocxZipWriter(fileobj)
+    PackageWriter._write_content_types_stream(writer, parts)
+    PackageWriter._write_pkg_rels(writer, package.rels)
+    PackageWriter._write_parts(writer, parts)
+    writer.close()
+
+
+def _save_to_buffer(doc: Document) -> BytesIO:
+    """Save doc into memory (no temp file round-trip); returns the buffer rewound to 0."""
+    buf = BytesIO()
+    _save_docx(doc, buf)
+    buf.seek(0)
+    return buf
+
+
+DOCX_MT = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+_DOWNLOAD_COUNTER = itertools.count()
+
+
+def _download_suffix() -> str:
+    """Distinct suffix for download filenames (no randomness needed): counter + unix time, hex."""
+    return f"{next(_DOWNLOAD_COUNTER):x}_{int(time.time()):x}"
+
+
+def _docx_response(buf: BytesIO, filename: str) -> Response:
+    # plain Response: Starlette sets Content-Length from the body, no chunked framing
+    return Response(
+        content=buf.getvalue(),
+        media_type=DOCX_MT,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def _build_document(
+    form_values: Dict[str, Optional[str]],
+    images: Dict[str, Optional[Union[bytes, IO[bytes]]]],
+) -> BytesIO:
+    """
+    Build the full tallysheet docx from validated form values and image bytes / files.
+    Runs synchronously (meant for a worker thread); returns the saved docx in memory.
+    """
+    f = form_values.get
+    sketsa = images.get("sketsa_lokasi_image")
+    if hasattr(sketsa, "read"):
+        sketsa.seek(0)
+        sketsa = sketsa.read()
+
+    doc = new_document()
 
     # --- Ensure add_* builder functions are implemented and available above ---
     add_formulir_tallysheet(
         doc,
         nomor="1",
-        latitude_derajat=latitude_derajat,
-        latitude_menit=latitude_menit,
-        latitude_detik=latitude_detik,
-        latitude_arah=latitude_arah,
-        longitude_derajat=longitude_derajat,
-        longitude_menit=longitude_menit,
-        longitude_detik=longitude_detik,
-        longitude_arah=longitude_arah,
+        latitude_derajat=f("latitude_derajat"),
+        latitude_menit=f("latitude_menit"),
+        latitude_detik=f("latitude_detik"),
+        latitude_arah=f("latitude_arah"),
+        longitude_derajat=f("longitude_derajat"),
+        longitude_menit=f("longitude_menit"),
+        longitude_detik=f("longitude_detik"),
+        longitude_arah=f("longitude_arah"),
     )
 
-    add_elevasi_lahan_row(doc, nomor="2", elevasi_lahan=elevasi_lahan)
+    add_elevasi_lahan_row(doc, nomor="2", elevasi_lahan=f("elevasi_lahan"))
 
     add_kondisi_air_tanah_row(
         doc,
-        kedalaman_air_tanah=kedalaman_air_tanah,
-        genangan=genangan,
-        banjir_bulan=banjir_bulan,
-        banjir_lama_hari=banjir_lama_hari,
-        banjir_ketinggian_air=banjir_ketinggian_air,
-        sumber_air_hujan=sumber_air_hujan,
-        sumber_air_limpasan_sungai=sumber_air_limpasan_sungai,
-        sumber_air_kiriman_hulu=sumber_air_kiriman_hulu,
-        sumber_air_lainnya_checkbox=sumber_air_lainnya_checkbox,
-        sumber_air_lainnya_text=sumber_air_lainnya_text,
+        kedalaman_air_tanah=f("kedalaman_air_tanah"),
+        genangan=f("genangan"),
+        banjir_bulan=f("banjir_bulan"),
+        banjir_lama_hari=f("banjir_lama_hari"),
+        banjir_ketinggian_air=f("banjir_ketinggian_air"),
+        sumber_air_hujan=f("sumber_air_hujan"),
+        sumber_air_limpasan_sungai=f("sumber_air_limpasan_sungai"),
+        sumber_air_kiriman_hulu=f("sumber_air_kiriman_hulu"),
+        sumber_air_lainnya_checkbox=f("sumber_air_lainnya_checkbox"),
+        sumber_air_lainnya_text=f("sumber_air_lainnya_text"),
     )
 
     add_tutupan_lahan_row(
         doc,
         nomor="4",
-        jenis_tanaman=jenis_tanaman,
-        status_masyarakat=status_masyarakat,
-        status_perusahaan=status_perusahaan,
-        nama_perusahaan=nama_perusahaan,
-        luas_konsesi=luas_konsesi,
+        jenis_tanaman=f("jenis_tanaman"),
+        status_masyarakat=f("status_masyarakat"),
+        status_perusahaan=f("status_perusahaan"),
+        nama_perusahaan=f("nama_perusahaan"),
+        luas_konsesi=f("luas_konsesi"),
     )
 
     add_flora_fauna_row(
         doc,
         numero="5" if False else "5",  # keep signature same; some earlier code used nomor param
-        flora_tidak_ada=flora_tidak_ada,
-        flora_ada=flora_ada,
-        flora_jenis=flora_jenis,
-        fauna_tidak_ada=fauna_tidak_ada,
-        fauna_ada=fauna_ada,
-        fauna_jenis=fauna_jenis,
+        flora_tidak_ada=f("flora_tidak_ada"),
+        flora_ada=f("flora_ada"),
+        flora_jenis=f("flora_jenis"),
+        fauna_tidak_ada=f("fauna_tidak_ada"),
+        fauna_ada=f("fauna_ada"),
+        fauna_jenis=f("fauna_jenis"),
     )
 
     add_drainase_row(
         doc,
         nomor="6",
-        drainase_alami_tidak_ada=drainase_alami_tidak_ada,
-        drainase_alami_ada=drainase_alami_ada,
-        drainase_buatan_tidak_ada=drainase_buatan_tidak_ada,
-        drainase_buatan_ada=drainase_buatan_ada,
-        drainase_buatan_saluran_terbuka=drainase_buatan_saluran_terbuka,
-        drainase_buatan_saluran_terkontrol=drainase_buatan_saluran_terkontrol,
-        tinggi_muka_air_saluran=tinggi_muka_air_saluran,
+        drainase_alami_tidak_ada=f("drainase_alami_tidak_ada"),
+        drainase_alami_ada=f("drainase_alami_ada"),
+        drainase_buatan_tidak_ada=f("drainase_buatan_tidak_ada"),
+        drainase_buatan_ada=f("drainase_buatan_ada"),
+        drainase_buatan_saluran_terbuka=f("drainase_buatan_saluran_terbuka"),
+        drainase_buatan_saluran_terkontrol=f("drainase_buatan_saluran_terkontrol"),
+        tinggi_muka_air_saluran=f("tinggi_muka_air_saluran"),
     )
 
     # Section 7 .. 16 (assumes add_kualitas_air_row etc. are defined)
     add_kualitas_air_row(
         doc,
         nomor="7",
-        kualitas_air_tanah_ph=kualitas_air_tanah_ph,
-        kualitas_air_saluran_ph=kualitas_air_saluran_ph,
-        kualitas_air_tanah_ec=kualitas_air_tanah_ec,
-        kualitas_air_saluran_ec=kualitas_air_saluran_ec,
-        kualitas_air_tanah_tds=kualitas_air_tanah_tds,
-        kualitas_air_saluran_tds=kualitas_air_saluran_tds,
+        kualitas_air_tanah_ph=f("kualitas_air_tanah_ph"),
+        kualitas_air_saluran_ph=f("kualitas_air_saluran_ph"),
+        kualitas_air_tanah_ec=f("kualitas_air_tanah_ec"),
+        kualitas_air_saluran_ec=f("kualitas_air_saluran_ec"),
+        kualitas_air_tanah_tds=f("kualitas_air_tanah_tds"),
+        kualitas_air_saluran_tds=f("kualitas_air_saluran_tds"),
     )
 
     add_substratum_tanah_liat_row(
         doc,
         nomor="8",
-        substratum_tanah_liat_ph=substratum_tanah_liat_ph,
-        substratum_tanah_liat_ec=substratum_tanah_liat_ec,
+        substratum_tanah_liat_ph=f("substratum_tanah_liat_ph"),
+        substratum_tanah_liat_ec=f("substratum_tanah_liat_ec"),
     )
 
     add_tipe_luapan_row(
         doc,
         nomor="9",
-        tipe_luapan_kemarau_a=tipe_luapan_kemarau_a,
-        tipe_luapan_kemarau_b=tipe_luapan_kemarau_b,
-        tipe_luapan_kemarau_c=tipe_luapan_kemarau_c,
-        tipe_luapan_kemarau_d=tipe_luapan_kemarau_d,
-        tipe_luapan_hujan_a=tipe_luapan_hujan_a,
-        tipe_luapan_hujan_b=tipe_luapan_hujan_b,
-        tipe_luapan_hujan_c=tipe_luapan_hujan_c,
-        tipe_luapan_hujan_d=tipe_luapan_hujan_d,
+        tipe_luapan_kemarau_a=f("tipe_luapan_kemarau_a"),
+        tipe_luapan_kemarau_b=f("tipe_luapan_kemarau_b"),
+        tipe_luapan_kemarau_c=f("tipe_luapan_kemarau_c"),
+        tipe_luapan_kemarau_d=f("tipe_luapan_kemarau_d"),
+        tipe_luapan_hujan_a=f("tipe_luapan_hujan_a"),
+        tipe_luapan_hujan_b=f("tipe_luapan_hujan_b"),
+        tipe_luapan_hujan_c=f("tipe_luapan_hujan_c"),
+        tipe_luapan_hujan_d=f("tipe_luapan_hujan_d"),
     )
 
     add_ketebalan_gambut_row(
         doc,
         nomor="10",
-        ketebalan_gambut_cm=ketebalan_gambut_cm,
-        tingkat_perombakan_saprik=tingkat_perombakan_saprik,
-        tingkat_perombakan_hemik=tingkat_perombakan_hemik,
-        tingkat_perombakan_fibrik=tingkat_perombakan_fibrik,
+        ketebalan_gambut_cm=f("ketebalan_gambut_cm"),
+        tingkat_perombakan_saprik=f("tingkat_perombakan_saprik"),
+        tingkat_perombakan_hemik=f("tingkat_perombakan_hemik"),
+        tingkat_perombakan_fibrik=f("tingkat_perombakan_fibrik"),
     )
 
     add_substratum_bawah_gambut_row(
         doc,
         nomor="11",
-        substratum_pasir_kwarsa=substratum_pasir_kwarsa,
-        substratum_clay_sedimen_sungai=substratum_clay_sedimen_sungai,
-        substratum_sedimen_berpirit=substratum_sedimen_berpirit,
-        substratum_granit=substratum_granit,
-        substratum_lainnya_checkbox=substratum_lainnya_checkbox,
-        substratum_lainnya_text=substratum_lainnya_text,
+        substratum_pasir_kwarsa=f("substratum_pasir_kwarsa"),
+        substratum_clay_sedimen_sungai=f("substratum_clay_sedimen_sungai"),
+        substratum_sedimen_berpirit=f("substratum_sedimen_berpirit"),
+        substratum_granit=f("substratum_granit"),
+        substratum_lainnya_checkbox=f("substratum_lainnya_checkbox"),
+        substratum_lainnya_text=f("substratum_lainnya_text"),
     )
 
     add_perkembangan_kerusakan_row(
         doc,
         nomor="12",
-        kerusakan_drainase_buatan=kerusakan_drainase_buatan,
-        kerusakan_terekspos_sedimen=kerusakan_terekspos_sedimen,
-        kondisi_tanaman_tidak_normal=kondisi_tanaman_tidak_normal,
-        kondisi_tanaman_tidak_produktif=kondisi_tanaman_tidak_produktif,
-        kondisi_tanaman_miring_tumbang=kondisi_tanaman_miring_tumbang,
-        kondisi_tanaman_terjadi_subsiden_checkbox=kondisi_tanaman_terjadi_subsiden_checkbox,
-        kondisi_tanaman_subsiden_cm=kondisi_tanaman_subsiden_cm,
-        kerapatan_tajuk=kerapatan_tajuk,
+        kerusakan_drainase_buatan=f("kerusakan_drainase_buatan"),
+        kerusakan_terekspos_sedimen=f("kerusakan_terekspos_sedimen"),
+        kondisi_tanaman_tidak_normal=f("kondisi_tanaman_tidak_normal"),
+        kondisi_tanaman_tidak_produktif=f("kondisi_tanaman_tidak_produktif"),
+        kondisi_tanaman_miring_tumbang=f("kondisi_tanaman_miring_tumbang"),
+        kondisi_tanaman_terjadi_subsiden_checkbox=f("kondisi_tanaman_terjadi_subsiden_checkbox"),
+        kondisi_tanaman_subsiden_cm=f("kondisi_tanaman_subsiden_cm"),
+        kerapatan_tajuk=f("kerapatan_tajuk"),
     )
 
     add_informasi_kebakaran_row(
         doc,
         nomor="13",
-        kebakaran_tahun=kebakaran_tahun,
-        kebakaran_bulan=kebakaran_bulan,
-        kebakaran_tanggal=kebakaran_tanggal,
-        kebakaran_lama_kejadian_bulan=kebakaran_lama_kejadian_bulan,
-        pemadaman_swadaya_masyarakat=pemadaman_swadaya_masyarakat,
-        pemadaman_bantuan_pemerintah=pemadaman_bantuan_pemerintah,
-        hujan_tanggal=hujan_tanggal,
-        hujan_bulan=hujan_bulan,
-        hujan_tahun=hujan_tahun,
-        hujan_lama_kejadian_jam=hujan_lama_kejadian_jam,
-        intensitas_hujan_tinggi=intensitas_hujan_tinggi,
-        intensitas_hujan_sedang=intensitas_hujan_sedang,
-        intensitas_hujan_rendah=intensitas_hujan_rendah,
+        kebakaran_tahun=f("kebakaran_tahun"),
+        kebakaran_bulan=f("kebakaran_bulan"),
+        kebakaran_tanggal=f("kebakaran_tanggal"),
+        kebakaran_lama_kejadian_bulan=f("kebakaran_lama_kejadian_bulan"),
+        pemadaman_swadaya_masyarakat=f("pemadaman_swadaya_masyarakat"),
+        pemadaman_bantuan_pemerintah=f("pemadaman_bantuan_pemerintah"),
+        hujan_tanggal=f("hujan_tanggal"),
+        hujan_bulan=f("hujan_bulan"),
+        hujan_tahun=f("hujan_tahun"),
+        hujan_lama_kejadian_jam=f("hujan_lama_kejadian_jam"),
+        intensitas_hujan_tinggi=f("intensitas_hujan_tinggi"),
+        intensitas_hujan_sedang=f("intensitas_hujan_sedang"),
+        intensitas_hujan_rendah=f("intensitas_hujan_rendah"),
     )
 
     add_analisis_lab_header(doc)
 
-    add_porositas_row(doc, nomor="14", porositas_bobot_isi=porositas_bobot_isi)
-    add_kelengasan_row(doc, nomor="15", kelengasan_kadar_air=kelengasan_kadar_air)
-    add_c_organik_row(doc, nomor="16", c_organik=c_organik)
+    add_porositas_row(doc, nomor="14", porositas_bobot_isi=f("porositas_bobot_isi"))
+    add_kelengasan_row(doc, nomor="15", kelengasan_kadar_air=f("kelengasan_kadar_air"))
+    add_c_organik_row(doc, nomor="16", c_organik=f("c_organik"))
 
     # sketsa lokasi
-    image_bytes = None
-    if sketsa_lokasi_image is not None:
-        try:
-            image_bytes = await sketsa_lokasi_image.read()
-        except Exception:
-            image_bytes = None
-    add_sketsa_lokasi_row(doc, sketsa_image_bytes=image_bytes)
-
-    # collect uploaded photos to dict (read bytes)
-    photo_fields = [
-        "foto_air_tanah_genangan_1","foto_air_tanah_genangan_2",
-        "foto_tutupan_lahan_1","foto_tutupan_lahan_2",
-        "foto_flora_fauna_1","foto_flora_fauna_2",
-        "foto_drainase_alami","foto_drainase_buatan",
-        "foto_kualitas_air_ec","foto_kualitas_air_tds","foto_kualitas_air_ph",
-        "foto_tmat_1","foto_tmat_2",
-        "foto_ketebalan_gambut_1","foto_ketebalan_gambut_2",
-        "foto_substratum_ec","foto_substratum_ph",
-        "foto_kerusakan_lahan_gambut_1","foto_kerusakan_lahan_gambut_2",
-        "foto_karakteristik_tanah_pirit_1","foto_karakteristik_tanah_pirit_2",
-        "foto_porositas_kelengasan_1","foto_porositas_kelengasan_2",
-        *[f"foto_tambahan_{i}" for i in range(1,9)]
-    ]
-    images: Dict[str, Optional[bytes]] = {}
-    for fname in photo_fields:
-        upload = form.get(fname)
-        if hasattr(upload, "read"):
-            try:
-                images[fname] = await upload.read()
-            except Exception:
-                images[fname] = None
-        else:
-            images[fname] = None
+    add_sketsa_lokasi_row(doc, sketsa_image_bytes=sketsa)
 
     # add photo sections
-    add_foto_lapangan_section(doc, images=images)
-    add_additional_photo_sections(doc, images=images)
+    add_photo_sections(doc, images)
 
-    # Save to temp file and schedule cleanup
-    tmpf = tempfile.NamedTemporaryFile(delete=False, suffix=".docx")
-    tmpf_name = tmpf.name
-    tmpf.close()
-    doc.save(tmpf_name)
+    return _save_to_buffer(doc)
 
-    out_name = f"tallysheet_{uuid.uuid4().hex}.docx"
 
-    def _cleanup(path: str):
-        try:
-            os.remove(path)
-        except Exception:
-            pass
+# ----------------------- Upload ingest -----------------------
+MAX_UPLOAD_BYTES = 8 << 20  # per image
+_UPLOAD_CHUNK = 64 << 10
 
-    background_tasks.add_task(_cleanup, tmpf_name)
 
-    return FileResponse(
-        path=tmpf_name,
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        filename=out_name,
-    )
+async def _ingest_upload(upload, limit: int = MAX_UPLOAD_BYTES) -> Optional[Tuple[IO[bytes], bytes]]:
+    """
+    Read an uploaded image in 64 KiB chunks, hashing it (BLAKE2b, 16 bytes) on the way.
+    Non-image content types are rejected with 415 and uploads over `limit` bytes with 413,
+    without reading the rest of the spooled file. The request as a whole was already
+    bounded by MAX_REQUEST_BYTES before the form was parsed.
+    Returns (the upload's own SpooledTemporaryFile rewound to 0, digest), or None for an
+    empty upload; the bytes are never copied.
+    """
+    content_type = (upload.content_type or "").lower()
+    if content_type and not content_type.startswith("image/") and content_type != "application/octet-stream":
+        raise HTTPException(status_code=415, detail=f"{upload.filename or 'upload'}: expected an image, got {content_type}")
+    too_large = HTTPException(status_code=413, detail=f"{upload.filename or 'upload'} is larger than {limit >> 20} MiB")
+    if upload.size is not None and upload.size > limit:
+        raise too_large
+
+    h = blake2b(digest_size=16)
+    total = 0
+    while chunk := await upload.read(_UPLOAD_CHUNK):
+        total += len(chunk)
+        if total > limit:
+            raise too_large
+        h.update(chunk)
+    if total == 0:
+        return None
+    await upload.seek(0)
+    return upload.file, h.digest()
+
+
+# ----------------------- Render backpressure -----------------------
+# each render holds the photos plus the whole XML tree in memory: bound how many run at once
+RENDER_CONCURRENCY = os.cpu_count() or 1
+RENDER_QUEUE_MAX = 4 * RENDER_CONCURRENCY
+_RENDER_SEM = asyncio.Semaphore(RENDER_CONCURRENCY)
+_render_pending = 0
+
+
+@asynccontextmanager
+async def _render_slot():
+    """
+    Hold one of RENDER_CONCURRENCY render slots. Requests beyond that wait for a slot;
+    once RENDER_QUEUE_MAX are already waiting, new ones get 503 immediately.
+    """
+    global _render_pending
+    if _render_pending >= RENDER_CONCURRENCY + RENDER_QUEUE_MAX:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "5"})
+    _render_pending += 1
+    try:
+        async with _RENDER_SEM:
+            yield
+    finally:
+        _render_pending -= 1
 
 
-# ----------------------- Endpoint: generate-sample -----------------------
-@app.get("/generate-sample")
-def generate_sample(background_tasks: BackgroundTasks):
+# ----------------------- Endpoint: generate-full-section -----------------------
+class TallysheetForm(BaseModel):
     """
-    Create a sample tallysheet docx (filled with example values) to inspect layout.
+    Scalar (non-file) fields of the tallysheet form; every field is optional text.
+    Numbers sent as JSON numbers are accepted and kept as strings.
     """
-    doc = Document()
-    sec = doc.sections[0]
-    sec.top_margin = Inches(1)
-    sec.bottom_margin = Inches(1)
-    sec.left_margin = Inches(1.25)
-    sec.right_margin = Inches(1.25)
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+    # koordinat (1)
+    latitude_derajat: Optional[str] = None
+    latitude_menit: Optional[str] = None
+    latitude_detik: Optional[str] = None
+    latitude_arah: Optional[str] = None
+    longitude_derajat: Optional[str] = None
+    longitude_menit: Optional[str] = None
+    longitude_detik: Optional[str] = None
+    longitude_arah: Optional[str] = None
+    # elevasi (2)
+    elevasi_lahan: Optional[str] = None
+    # kondisi air tanah (3)
+    kedalaman_air_tanah: Optional[str] = None
+    genangan: Optional[str] = None
+    banjir_bulan: Optional[str] = None
+    banjir_lama_hari: Optional[str] = None
+    banjir_ketinggian_air: Optional[str] = None
+    sumber_air_hujan: Optional[str] = None
+    sumber_air_limpasan_sungai: Optional[str] = None
+    sumber_air_kiriman_hulu: Optional[str] = None
+    sumber_air_lainnya_checkbox: Optional[str] = None
+    sumber_air_lainnya_text: Optional[str] = None
+    # tutupan lahan (4)
+    jenis_tanaman: Optional[str] = None
+    status_masyarakat: Optional[str] = None
+    status_perusahaan: Optional[str] = None
+    nama_perusahaan: Optional[str] = None
+    luas_konsesi: Optional[str] = None
+    # flora/fauna (5)
+    flora_tidak_ada: Optional[str] = None
+    flora_ada: Optional[str] = None
+    flora_jenis: Optional[str] = None
+    fauna_tidak_ada: Optional[str] = None
+    fauna_ada: Optional[str] = None
+    fauna_jenis: Optional[str] = None
+    # drainase (6)
+    drainase_alami_tidak_ada: Optional[str] = None
+    drainase_alami_ada: Optional[str] = None
+    drainase_buatan_tidak_ada: Optional[str] = None
+    drainase_buatan_ada: Optional[str] = None
+    drainase_buatan_saluran_terbuka: Optional[str] = None
+    drainase_buatan_saluran_terkontrol: Optional[str] = None
+    tinggi_muka_air_saluran: Optional[str] = None
+    # kualitas air (7)
+    kualitas_air_tanah_ph: Optional[str] = None
+    kualitas_air_saluran_ph: Optional[str] = None
+    kualitas_air_tanah_ec: Optional[str] = None
+    kualitas_air_saluran_ec: Optional[str] = None
+    kualitas_air_tanah_tds: Optional[str] = None
+    kualitas_air_saluran_tds: Optional[str] = None
+    # substratum tanah liat (8)
+    substratum_tanah_liat_ph: Optional[str] = None
+    substratum_tanah_liat_ec: Optional[str] = None
+    # tipe luapan (9)
+    tipe_luapan_kemarau_a: Optional[str] = None
+    tipe_luapan_kemarau_b: Optional[str] = None
+    tipe_luapan_kemarau_c: Optional[str] = None
+    tipe_luapan_kemarau_d: Optional[str] = None
+    tipe_luapan_hujan_a: Optional[str] = None
+    tipe_luapan_hujan_b: Optional[str] = None
+    tipe_luapan_hujan_c: Optional[str] = None
+    tipe_luapan_hujan_d: Optional[str] = None
+    # ketebalan gambut (10)
+    ketebalan_gambut_cm: Optional[str] = None
+    tingkat_perombakan_saprik: Optional[str] = None
+    tingkat_perombakan_hemik: Optional[str] = None
+    tingkat_perombakan_fibrik: Optional[str] = None
+    # substratum bawah (11)
+    substratum_pasir_kwarsa: Optional[str] = None
+    substratum_clay_sedimen_sungai: Optional[str] = None
+    substratum_sedimen_berpirit: Optional[str] = None
+    substratum_granit: Optional[str] = None
+    substratum_lainnya_checkbox: Optional[str] = None
+    substratum_lainnya_text: Optional[str] = None
+    # perkembangan kerusakan (12)
+    kerusakan_drainase_buatan: Optional[str] = None
+    kerusakan_terekspos_sedimen: Optional[str] = None
+    kondisi_tanaman_tidak_normal: Optional[str] = None
+    kondisi_tanaman_tidak_produktif: Optional[str] = None
+    kondisi_tanaman_miring_tumbang: Optional[str] = None
+    kondisi_tanaman_terjadi_subsiden_checkbox: Optional[str] = None
+    kondisi_tanaman_subsiden_cm: Optional[str] = None
+    kerapatan_tajuk: Optional[str] = None
+    # informasi kebakaran & hujan (13)
+    kebakaran_tahun: Optional[str] = None
+    kebakaran_bulan: Optional[str] = None
+    kebakaran_tanggal: Optional[str] = None
+    kebakaran_lama_kejadian_bulan: Optional[str] = None
+    pemadaman_swadaya_masyarakat: Optional[str] = None
+    pemadaman_bantuan_pemerintah: Optional[str] = None
+    hujan_tanggal: Optional[str] = None
+    hujan_bulan: Optional[str] = None
+    hujan_tahun: Optional[str] = None
+    hujan_lama_kejadian_jam: Optional[str] = None
+    intensitas_hujan_tinggi: Optional[str] = None
+    intensitas_hujan_sedang: Optional[str] = None
+    intensitas_hujan_rendah: Optional[str] = None
+    # porositas / kelengasan / c-organik (14..16)
+    porositas_bobot_isi: Optional[str] = None
+    kelengasan_kadar_air: Optional[str] = None
+    c_organik: Optional[str] = None
+
+
+# numeric validation rules (field_name, is_integer)
+NUMERIC_RULES = compile_numeric_rules([
+    ("latitude_derajat", False),
+    ("latitude_menit", False),
+    ("latitude_detik", False),
+    ("longitude_derajat", False),
+    ("longitude_menit", False),
+    ("longitude_detik", False),
+    ("elevasi_lahan", False),
+    ("kedalaman_air_tanah", False),
+    ("genangan", False),
+    ("banjir_lama_hari", True),
+    ("banjir_ketinggian_air", False),
+    ("tinggi_muka_air_saluran", False),
+    ("kualitas_air_tanah_ph", False),
+    ("kualitas_air_saluran_ph", False),
+    ("kualitas_air_tanah_ec", False),
+    ("kualitas_air_saluran_ec", False),
+    ("kualitas_air_tanah_tds", False),
+    ("kualitas_air_saluran_tds", False),
+    ("substratum_tanah_liat_ph", False),
+    ("substratum_tanah_liat_ec", False),
+    ("ketebalan_gambut_cm", False),
+    ("kondisi_tanaman_subsiden_cm", False),
+    ("hujan_lama_kejadian_jam", False),
+    ("porositas_bobot_isi", False),
+    ("kelengasan_kadar_air", False),
+    ("c_organik", False),
+])
+
+# uploaded photo field names (all optional)
+PHOTO_FIELDS = [
+    "foto_air_tanah_genangan_1","foto_air_tanah_genangan_2",
+    "foto_tutupan_lahan_1","foto_tutupan_lahan_2",
+    "foto_flora_fauna_1","foto_flora_fauna_2",
+    "foto_drainase_alami","foto_drainase_buatan",
+    "foto_kualitas_air_ec","foto_kualitas_air_tds","foto_kualitas_air_ph",
+    "foto_tmat_1","foto_tmat_2",
+    "foto_ketebalan_gambut_1","foto_ketebalan_gambut_2",
+    "foto_substratum_ec","foto_substratum_ph",
+    "foto_kerusakan_lahan_gambut_1","foto_kerusakan_lahan_gambut_2",
+    "foto_karakteristik_tanah_pirit_1","foto_karakteristik_tanah_pirit_2",
+    "foto_porositas_kelengasan_1","foto_porositas_kelengasan_2",
+    *[f"foto_tambahan_{i}" for i in range(1,9)]
+]
+
+# whole-request cap, checked against Content-Length before anything is parsed or spooled:
+# every image slot at MAX_UPLOAD_BYTES, plus room for the text fields and multipart framing
+MAX_REQUEST_BYTES = (len(PHOTO_FIELDS) + 1) * MAX_UPLOAD_BYTES + (1 << 20)
+_MAX_FORM_FILES = len(PHOTO_FIELDS) + 1
+_MAX_FORM_FIELDS = len(TallysheetForm.model_fields) + 1  # + 'payload'
+_MAX_TEXT_PART = 1 << 20
+
+
+def _check_body_size(request: Request) -> None:
+    content_length = request.headers.get("content-length")
+    if content_length is None:
+        raise HTTPException(status_code=411, detail="Content-Length is required")
+    if not content_length.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid Content-Length")
+    if int(content_length) > MAX_REQUEST_BYTES:
+        raise HTTPException(status_code=413, detail=f"Request body is larger than {MAX_REQUEST_BYTES >> 20} MiB")
+
+
+_FORM_MEDIA_TYPES = {"multipart/form-data", "application/x-www-form-urlencoded"}
+
+
+def _is_json_media_type(media_type: str) -> bool:
+    return media_type == "application/json" or (media_type.startswith("application/") and media_type.endswith("+json"))
+
+
+# the endpoint reads the raw Request, so FastAPI cannot infer the body schema: describe it here
+_FULL_SECTION_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": TallysheetForm.model_json_schema()},
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "payload": {"type": "string", "description": "TallysheetForm as JSON"},
+                        **{
+                            name: {"type": "string", "format": "binary"}
+                            for name in PHOTO_FIELDS + ["sketsa_lokasi_image"]
+                        },
+                    },
+                },
+            },
+        },
+    },
+}
+
+
+@app.post("/generate-full-section", openapi_extra=_FULL_SECTION_OPENAPI)
+async def generate_full_section(request: Request):
+    """
+    Accepts the form either as
+      - multipart/form-data: a single 'payload' field holding the JSON of TallysheetForm,
+        plus the images as file parts named like PHOTO_FIELDS / 'sketsa_lokasi_image'
+        (individual text fields are still read when no 'payload' is sent), or
+      - application/json (or any +json type): the TallysheetForm JSON only (no images).
+    Any other body type is rejected with 415.
+    """
+    _check_body_size(request)
+    media_type = request.headers.get("content-type", "").split(";", 1)[0].strip().lower()
+    is_json = _is_json_media_type(media_type)
+    if not is_json and media_type not in _FORM_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Unsupported Content-Type {media_type or '(none)'}: send JSON or multipart/form-data",
+        )
+    text_fields: Dict[str, str] = {}
+    files: Dict[str, Any] = {}
+    try:
+        if is_json:
+            fields = TallysheetForm.model_validate_json(await request.body())
+        else:
+            # split the multipart form into text and file parts in a single pass
+            form = await request.form(
+                max_files=_MAX_FORM_FILES, max_fields=_MAX_FORM_FIELDS, max_part_size=_MAX_TEXT_PART
+            )
+            for key, value in form.multi_items():
+                if isinstance(value, str):
+                    text_fields[key] = value
+                else:
+                    files[key] = value
+            payload = text_fields.get("payload")
+            if payload is not None:
+                fields = TallysheetForm.model_validate_json(payload)
+            else:
+                fields = TallysheetForm.model_validate(text_fields)
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors())
+    form_values = fields.model_dump()
+
+    errors = validate_numeric_fields(form_values, NUMERIC_RULES)
+    if errors:
+        return JSONResponse(status_code=422, content={"detail": errors})
+
+    # Ingest all uploads (sketsa + photos) concurrently instead of one await per field
+    uploads = [(name, files[name]) for name in PHOTO_FIELDS + ["sketsa_lokasi_image"] if name in files]
+    results = await asyncio.gather(*(_ingest_upload(upload) for _, upload in uploads), return_exceptions=True)
+    # size/type rejections abort the request; any other read failure just leaves that image empty
+    rejected = next((r for r in results if isinstance(r, HTTPException)), None)
+    images: Dict[str, Optional[Union[bytes, IO[bytes]]]] = dict.fromkeys(PHOTO_FIELDS)
+    digests: Dict[str, bytes] = {}
+    for (name, _), result in zip(uploads, results):
+        if result is None or isinstance(result, BaseException):
+            continue
+        images[name], digests[name] = result
+
+    try:
+        if rejected is not None:
+            raise rejected
+        async with _render_slot():
+            await _downscale_photos(images, digests)
+            # Build + save off the event loop
+            buf = await run_in_threadpool(_build_document, form_values, images)
+    finally:
+        # release the upload spools now rather than when Starlette tears the request down
+        for _, upload in uploads:
+            await upload.close()
+
+    out_name = f"tallysheet_{_download_suffix()}.docx"
+
+    return _docx_response(buf, out_name)
+
+
+# ----------------------- Endpoint: generate-sample -----------------------
+def _build_sample_document() -> BytesIO:
+    """Build the sample tallysheet (fixed example values, placeholder photos) in memory."""
+    doc = new_document()
 
     # Example usage (requires add_* functions defined)
     add_formulir_tallysheet(
@@ -819,27 +1250,45 @@ def generate_sample(background_tasks: BackgroundTasks):
     add_c_organik_row(doc, nomor="16", c_organik="58")
     add_sketsa_lokasi_row(doc, sketsa_image_bytes=None)
 
-    # sample photos: pass None so placeholders appear
-    add_foto_lapangan_section(doc, images={})
-    add_additional_photo_sections(doc, images={})
+    # sample photos: none, so the placeholder layout is used
+    add_photo_sections(doc, {})
 
-    tmpf = tempfile.NamedTemporaryFile(delete=False, suffix=".docx")
-    tmpf_name = tmpf.name
-    tmpf.close()
-    doc.save(tmpf_name)
+    return _save_to_buffer(doc)
 
-    out_name = f"tallysheet_sample_{uuid.uuid4().hex}.docx"
 
-    def _cleanup(path: str):
-        try:
-            os.remove(path)
-        except Exception:
-            pass
+@lru_cache(maxsize=1)
+def _sample_docx() -> Tuple[bytes, str]:
+    """The sample has no inputs, so it is rendered once per process: (docx bytes, ETag)."""
+    data = _build_sample_document().getvalue()
+    return data, '"%s"' % blake2b(data, digest_size=16).hexdigest()
 
-    background_tasks.add_task(_cleanup, tmpf_name)
 
-    return FileResponse(
-        path=tmpf_name,
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        filename=out_name,
-    )
\ No newline at end of file
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match check (RFC 9110 13.1.2): "*" or a comma-separated list of entity tags,
+    compared weakly, i.e. a W/ prefix on either side is ignored.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+@app.get("/generate-sample")
+async def generate_sample(request: Request):
+    """
+    Create a sample tallysheet docx (filled with example values) to inspect layout.
+    """
+    data, etag = await run_in_threadpool(_sample_docx)
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    out_name = f"tallysheet_sample_{_download_suffix()}.docx"
+
+    return Response(
+        content=data,
+        media_type=DOCX_MT,
+        headers={"Content-Disposition": f'attachment; filename="{out_name}"', "ETag": etag},
+    )